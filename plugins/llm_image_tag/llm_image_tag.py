@@ -11,17 +11,49 @@ It is self-contained and does not require the CommunityScrapers repo at runtime.
 from __future__ import annotations
 
 import base64
+import email.utils
+import functools
+import hashlib
+import http.client
 import json
 import mimetypes
 import os
+import random
 import re
 import sys
+import threading
+import time
 import traceback
-import urllib.error
+import urllib.parse
 import urllib.request
-from typing import Any, Optional, List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Optional, List, Dict, Iterator, Union
 import io
-from PIL import Image
+
+# Pillow is optional: without it images are sent as-is (no WebP conversion or downscaling).
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None  # type: ignore[assignment]
+    ImageOps = None  # type: ignore[assignment]
+
+# Prefer orjson for the large request/response bodies; fall back to the stdlib.
+try:
+    import orjson  # type: ignore
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("ascii")
+
+    def _loads(data: Union[bytes, str]) -> Any:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode("utf-8", errors="ignore")
+        return json.loads(data)
 
 # Stash helper classes
 try:
@@ -38,6 +70,31 @@ DEFAULT_MODEL = "gemma3:4b-it-q8_0"
 DEFAULT_TEMP = 0.7
 DEFAULT_MAX_TOKENS = -1
 DEFAULT_TIMEOUT = 3600.0
+DEFAULT_MAX_TAG_LIST_CHARS = 32 * 1024
+DEFAULT_CACHE_PROMPT = False
+DEFAULT_MAX_IMAGE_EDGE = 1344
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_MAX_IMAGE_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_PARALLEL = 4
+DEFAULT_CACHE_TTL = 7 * 24 * 3600.0
+
+# How long the existing-tag list stays cached within one plugin process.
+EXISTING_TAGS_TTL = 300.0
+
+# Batch tagging: retries per image on HTTP 429, base backoff in seconds, and how many
+# consecutive 429s halve the number of concurrent LLM calls.
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF = 1.0
+RATE_LIMIT_STREAK = 3
+
+# Tag results are only cached when sampling is (near) deterministic. The cache
+# directory is swept once per process: expired entries are deleted and, beyond
+# CACHE_MAX_ENTRIES, the oldest ones too.
+CACHE_MAX_TEMP = 0.2
+CACHE_MAX_ENTRIES = 10000
+
+# Images larger than this are re-encoded even if their dimensions are within llmMaxImageEdge.
+DOWNSCALE_MIN_BYTES = 512 * 1024
 
 PROMPT_DEFAULT = (
     "You are a tagging assistant. Look carefully at the image and return ONLY a JSON array "
@@ -57,6 +114,13 @@ settings = {
     "llmTemp": DEFAULT_TEMP,
     "llmMaxTokens": DEFAULT_MAX_TOKENS,
     "llmTimeout": DEFAULT_TIMEOUT,
+    "llmMaxTagListChars": DEFAULT_MAX_TAG_LIST_CHARS,
+    "llmCachePrompt": DEFAULT_CACHE_PROMPT,
+    "llmMaxImageEdge": DEFAULT_MAX_IMAGE_EDGE,
+    "llmJpegQuality": DEFAULT_JPEG_QUALITY,
+    "llmMaxImageBytes": DEFAULT_MAX_IMAGE_BYTES,
+    "llmMaxParallel": DEFAULT_MAX_PARALLEL,
+    "llmCacheTtl": DEFAULT_CACHE_TTL,
     "zzdebugTracing": False,
 }
 
@@ -173,86 +237,368 @@ def _env_or_setting(name: str, env: str, default: Any) -> Any:
         return default
     return v
 
-BASE_URL: str = _resolve_base_url()
-MODEL: str = str(_env_or_setting("llmModel", "LLM_MODEL", DEFAULT_MODEL))
-TEMP: float = float(_env_or_setting("llmTemp", "LLM_TEMP", DEFAULT_TEMP))
-MAX_TOKENS: int = int(_env_or_setting("llmMaxTokens", "LLM_MAX_TOKENS", DEFAULT_MAX_TOKENS))
-TIMEOUT: float = float(_env_or_setting("llmTimeout", "LLM_TIMEOUT", DEFAULT_TIMEOUT))
-API_KEY: str = os.getenv("LLM_API_KEY", "none")
-PROMPT: str = os.getenv("LLM_TAG_PROMPT", PROMPT_DEFAULT)
+# LLM settings are resolved on first use and memoized, so tasks that never reach the
+# LLM (or pass args.llmBaseUrl) skip the GraphQL configuration probe at startup.
+@functools.lru_cache(maxsize=None)
+def _base_url() -> str:
+    return _resolve_base_url()
+
+@functools.lru_cache(maxsize=None)
+def _model() -> str:
+    return str(_env_or_setting("llmModel", "LLM_MODEL", DEFAULT_MODEL))
+
+@functools.lru_cache(maxsize=None)
+def _temp() -> float:
+    return float(_env_or_setting("llmTemp", "LLM_TEMP", DEFAULT_TEMP))
+
+@functools.lru_cache(maxsize=None)
+def _max_tokens() -> int:
+    return int(_env_or_setting("llmMaxTokens", "LLM_MAX_TOKENS", DEFAULT_MAX_TOKENS))
+
+@functools.lru_cache(maxsize=None)
+def _timeout() -> float:
+    return float(_env_or_setting("llmTimeout", "LLM_TIMEOUT", DEFAULT_TIMEOUT))
+
+@functools.lru_cache(maxsize=None)
+def _api_key() -> str:
+    return os.getenv("LLM_API_KEY", "none")
+
+@functools.lru_cache(maxsize=None)
+def _prompt() -> str:
+    return os.getenv("LLM_TAG_PROMPT", PROMPT_DEFAULT)
+
+MAX_TAG_LIST_CHARS: int = int(_env_or_setting("llmMaxTagListChars", "LLM_MAX_TAG_LIST_CHARS", DEFAULT_MAX_TAG_LIST_CHARS))
+CACHE_PROMPT: bool = str(_env_or_setting("llmCachePrompt", "LLM_CACHE_PROMPT", DEFAULT_CACHE_PROMPT)).strip().lower() not in ("0", "false", "no", "off")
+MAX_IMAGE_EDGE: int = int(_env_or_setting("llmMaxImageEdge", "LLM_MAX_IMAGE_EDGE", DEFAULT_MAX_IMAGE_EDGE))
+JPEG_QUALITY: int = int(_env_or_setting("llmJpegQuality", "LLM_JPEG_QUALITY", DEFAULT_JPEG_QUALITY))
+MAX_IMAGE_BYTES: int = int(_env_or_setting("llmMaxImageBytes", "LLM_MAX_IMAGE_BYTES", DEFAULT_MAX_IMAGE_BYTES))
+MAX_PARALLEL: int = int(_env_or_setting("llmMaxParallel", "LLM_MAX_PARALLEL", DEFAULT_MAX_PARALLEL))
+CACHE_TTL: float = float(_env_or_setting("llmCacheTtl", "LLM_CACHE_TTL", DEFAULT_CACHE_TTL))
+
+class RateLimitError(RuntimeError):
+    """Raised when the LLM server still answers HTTP 429 after the HTTP-level retries."""
+
+# Precompiled patterns: reasoning blocks in model output, the outermost [...] span,
+# characters not allowed in a tag (anything other than letters, digits, "_", "-" and
+# space), and characters not allowed in a request id used in result file names.
+_THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL | re.IGNORECASE)
+_JSON_ARR_RE = re.compile(r"\[.*\]", re.DOTALL)
+_TAG_DISALLOWED_RE = re.compile(r"[^\w\- ]")
+_REQID_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+# ----------------------------
+# Pooled HTTP client
+# ----------------------------
+
+# Keep-alive connections per (scheme, host, port) so repeated LLM calls and image
+# fetches skip the TCP/TLS handshake.
+HTTP_POOL_MAXSIZE = 32
+
+# Transient HTTP failures are retried with exponential backoff (or the server's
+# Retry-After, capped) before the error is surfaced.
+HTTP_RETRIES = 4
+HTTP_BACKOFF = 0.5
+HTTP_MAX_RETRY_AFTER = 120.0
+HTTP_RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+# GET requests follow up to this many redirects, as urlopen did.
+HTTP_MAX_REDIRECTS = 5
+HTTP_REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+
+_pool_lock = threading.Lock()
+_pool: Dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+
+@functools.lru_cache(maxsize=16)
+def _proxy_for(scheme: str, host: str) -> Optional[tuple[str, int, Optional[str]]]:
+    """
+    Proxy (host, port, Proxy-Authorization) from the *_proxy environment for this
+    scheme, honoring no_proxy. The proxy itself is always spoken to in plain HTTP.
+    """
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    auth = None
+    if parts.username:
+        creds = f"{urllib.parse.unquote(parts.username)}:{urllib.parse.unquote(parts.password or '')}"
+        auth = "Basic " + base64.b64encode(creds.encode("utf-8")).decode("ascii")
+    return parts.hostname or "", parts.port or 80, auth
+
+@functools.lru_cache(maxsize=16)
+def _split_url(url: str) -> tuple[tuple[str, str, int], str]:
+    parts = urllib.parse.urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    if scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported URL scheme in {url!r}")
+    host = parts.hostname or ""
+    port = parts.port or (443 if scheme == "https" else 80)
+    if scheme == "http" and _proxy_for(scheme, host) is not None:
+        # Plain HTTP through a proxy uses the absolute URL as the request target.
+        return (scheme, host, port), urllib.parse.urlunsplit((scheme, parts.netloc, parts.path or "/", parts.query, ""))
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    return (scheme, host, port), target
 
-def _http_get(url: str, timeout: float = TIMEOUT) -> tuple[int, Dict[str, str], bytes]:
-    req = urllib.request.Request(url, method="GET")
+def _acquire_connection(key: tuple[str, str, int], timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+    with _pool_lock:
+        idle = _pool.get(key)
+        conn = idle.pop() if idle else None
+    if conn is not None:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+    scheme, host, port = key
+    cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    proxy = _proxy_for(scheme, host)
+    if proxy is None:
+        return cls(host, port, timeout=timeout), False
+    proxy_host, proxy_port, auth = proxy
+    conn = cls(proxy_host, proxy_port, timeout=timeout)
+    if scheme == "https":
+        # HTTPS goes through a CONNECT tunnel; TLS is still negotiated with the origin.
+        conn.set_tunnel(host, port, headers={"Proxy-Authorization": auth} if auth else None)
+    return conn, False
+
+def _release_connection(key: tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+    with _pool_lock:
+        idle = _pool.setdefault(key, [])
+        if len(idle) < HTTP_POOL_MAXSIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+def _retry_delay(resp: Optional[http.client.HTTPResponse], attempt: int) -> float:
+    """Honor Retry-After (seconds or HTTP date) when present, else jittered exponential backoff."""
+    value = resp.getheader("Retry-After") if resp is not None else None
+    if value:
+        try:
+            return min(HTTP_MAX_RETRY_AFTER, max(0.0, float(value)))
+        except ValueError:
+            pass
+        try:
+            when = email.utils.parsedate_to_datetime(value).timestamp()
+            return min(HTTP_MAX_RETRY_AFTER, max(0.0, when - time.time()))
+        except Exception:
+            pass
+    return HTTP_BACKOFF * 2 ** attempt + random.random() * 0.1
+
+@contextmanager
+def _pooled_request(method: str, url: str, body: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Iterator[http.client.HTTPResponse]:
+    """
+    Send a request over a pooled keep-alive connection and yield the response.
+    Connection errors and HTTP_RETRY_STATUSES are retried up to HTTP_RETRIES times;
+    the last response is yielded whatever its status. GET follows redirects and any
+    request honors the *_proxy environment. The connection goes back to the pool
+    only if the body was fully read.
+    """
+    key, target = _split_url(url)
+    if timeout is None:
+        timeout = _timeout()
+    attempt = 0
+    redirects = 0
+    while True:
+        conn, reused = _acquire_connection(key, timeout)
+        request_headers = dict(headers or {})
+        proxy = _proxy_for(key[0], key[1])
+        if proxy is not None and key[0] == "http" and proxy[2]:
+            request_headers["Proxy-Authorization"] = proxy[2]
+        try:
+            conn.request(method, target, body=body, headers=request_headers)
+            resp = conn.getresponse()
+        except ConnectionError as e:
+            conn.close()
+            # An idle keep-alive socket may have been closed by the server; retry on a fresh one.
+            if reused:
+                continue
+            if attempt >= HTTP_RETRIES:
+                raise
+            delay = _retry_delay(None, attempt)
+            stash.Warn(f"[LLMImageTag] {method} {url} failed ({e}); retrying in {delay:.1f}s")
+        except Exception:
+            conn.close()
+            raise
+        else:
+            location = resp.getheader("Location")
+            if method == "GET" and resp.status in HTTP_REDIRECT_STATUSES and location and redirects < HTTP_MAX_REDIRECTS:
+                resp.read()
+                _release_connection(key, conn)
+                url = urllib.parse.urljoin(url, location)
+                key, target = _split_url(url)
+                redirects += 1
+                continue
+            if resp.status not in HTTP_RETRY_STATUSES or attempt >= HTTP_RETRIES:
+                break
+            delay = _retry_delay(resp, attempt)
+            resp.read()
+            _release_connection(key, conn)
+            stash.Warn(f"[LLMImageTag] {method} {url} returned HTTP {resp.status}; retrying in {delay:.1f}s")
+        attempt += 1
+        time.sleep(delay)
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            body = resp.read()
-            headers = {k: v for k, v in resp.headers.items()}
-            return (getattr(resp, "status", 200), headers, body)
-    except urllib.error.HTTPError as e:
-        return (e.code, {k: v for k, v in e.headers.items()} if e.headers else {}, e.read() if hasattr(e, "read") else b"")
-    except Exception as e:
-        raise RuntimeError(f"HTTP GET failed for {url}: {e}") from e
+        yield resp
+    finally:
+        if resp.isclosed():
+            _release_connection(key, conn)
+        else:
+            conn.close()
 
-def _http_post_json(url: str, json_body: Dict[str, Any], headers: Optional[Dict[str, str]] = None, timeout: float = TIMEOUT) -> Dict[str, Any]:
+def _http_post_json(url: str, json_body: Union[Dict[str, Any], bytes, memoryview], headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """POST a JSON body (a dict, or an already-encoded buffer) and decode the JSON reply."""
     h = {"Content-Type": "application/json"}
     if headers:
         h.update(headers)
-    data = json.dumps(json_body).encode("utf-8")
-    req = urllib.request.Request(url, data=data, headers=h, method="POST")
+    data = json_body if isinstance(json_body, (bytes, memoryview)) else _dumps(json_body)
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            raw = resp.read()
-            try:
-                return json.loads(raw.decode("utf-8", errors="ignore"))
-            except Exception as e:
-                raise RuntimeError(f"Non-JSON response from {url}: {raw[:500]!r} ({e})") from e
-    except urllib.error.HTTPError as e:
-        detail = getattr(e, "read", lambda: b"")()
-        raise RuntimeError(f"HTTP {e.code} {e.reason} from {url}: {detail[:500].decode('utf-8', errors='ignore')}") from e
+        with _pooled_request("POST", url, body=data, headers=h, timeout=timeout) as resp:
+            status, reason, raw = resp.status, resp.reason, resp.read()
     except Exception as e:
         raise RuntimeError(f"HTTP POST failed for {url}: {e}") from e
+    if status == 429:
+        raise RateLimitError(f"HTTP {status} {reason} from {url}: {raw[:500].decode('utf-8', errors='ignore')}")
+    if status >= 400:
+        raise RuntimeError(f"HTTP {status} {reason} from {url}: {raw[:500].decode('utf-8', errors='ignore')}")
+    try:
+        return _loads(raw)
+    except Exception as e:
+        raise RuntimeError(f"Non-JSON response from {url}: {raw[:500]!r} ({e})") from e
+
+# Read size for base64 streaming; a multiple of 3 so chunk encodings concatenate cleanly.
+B64_CHUNK = 57 * 1024
+
+def _prepare_image(fp: BinaryIO, mime: str, size: Optional[int]) -> tuple[BinaryIO, str]:
+    """
+    Downscale images above DOWNSCALE_MIN_BYTES or MAX_IMAGE_EDGE to a JPEG, and convert
+    WebP to PNG. Anything else, or anything Pillow cannot handle, streams through as-is.
+    """
+    if Image is None:
+        return fp, mime
+    is_webp = mime == "image/webp"
+    if not is_webp and MAX_IMAGE_EDGE <= 0:
+        return fp, mime
+    seekable = fp.seekable()
+    if not is_webp and not seekable and size is not None and size <= DOWNSCALE_MIN_BYTES:
+        # Small remote image: not worth buffering just to read its dimensions.
+        return fp, mime
+    if not seekable:
+        fp = io.BytesIO(fp.read())
+    start = fp.tell()
+    try:
+        img = Image.open(fp)
+        if MAX_IMAGE_EDGE > 0 and ((size or 0) > DOWNSCALE_MIN_BYTES or max(img.size) > MAX_IMAGE_EDGE):
+            # The JPEG re-encode drops EXIF, so bake the orientation into the pixels first.
+            # exif_transpose decodes the image, so request a reduced JPEG decode before it.
+            img.draft("RGB", (MAX_IMAGE_EDGE, MAX_IMAGE_EDGE))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), getattr(Image, "Resampling", Image).LANCZOS)
+            out = io.BytesIO()
+            img.convert("RGB").save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+            out.seek(0)
+            return out, "image/jpeg"
+        if is_webp:
+            out = io.BytesIO()
+            img.save(out, format="PNG")
+            out.seek(0)
+            return out, "image/png"
+    except Exception as e:
+        # Log but continue with original data if conversion fails
+        stash.Warn(f"Failed to convert {mime} image: {e}")
+    fp.seek(start)
+    return fp, mime
+
+class _CappedStream:
+    """Read-only wrapper that fails once more than limit bytes have been read."""
+
+    def __init__(self, raw: Any, limit: int) -> None:
+        self._raw = raw
+        self._remaining = limit
+        self._limit = limit
+
+    def read(self, size: int = -1) -> bytes:
+        # Never ask for more than one byte past the cap, so an oversized body is not buffered.
+        if size is None or size < 0 or size > self._remaining + 1:
+            size = self._remaining + 1
+        data = self._raw.read(size)
+        self._remaining -= len(data)
+        if self._remaining < 0:
+            raise RuntimeError(f"image too large: over {self._limit} bytes")
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
 
-def _read_image_bytes(path_or_url: str) -> tuple[bytes, str]:
+@contextmanager
+def _open_image(path_or_url: str) -> Iterator[tuple[BinaryIO, str]]:
+    """
+    Yield a readable binary stream of the image plus its MIME type. Remote images are
+    streamed from the pooled connection rather than buffered up front.
+    """
     if path_or_url.startswith("http://") or path_or_url.startswith("https://"):
-        status, headers, body = _http_get(path_or_url, timeout=TIMEOUT)
-        if status < 200 or status >= 300:
-            raise RuntimeError(f"Failed to fetch image URL {path_or_url}: HTTP {status}")
-        content_type = headers.get("Content-Type") or "application/octet-stream"
-        data, mime = body, content_type
+        with _pooled_request("GET", path_or_url) as resp:
+            if resp.status < 200 or resp.status >= 300:
+                raise RuntimeError(f"Failed to fetch image URL {path_or_url}: HTTP {resp.status}")
+            # Reject on Content-Length before any of the body is read.
+            if MAX_IMAGE_BYTES > 0 and resp.length is not None and resp.length > MAX_IMAGE_BYTES:
+                raise RuntimeError(f"image too large: {resp.length} bytes (limit {MAX_IMAGE_BYTES})")
+            mime = resp.getheader("Content-Type") or "application/octet-stream"
+            # Content-Length may be absent or wrong, so also cap what is actually read.
+            body = _CappedStream(resp, MAX_IMAGE_BYTES) if MAX_IMAGE_BYTES > 0 else resp
+            yield _prepare_image(body, mime, resp.length)  # type: ignore[arg-type]
     else:
         mime = mimetypes.guess_type(os.path.basename(path_or_url))[0] or "image/jpeg"
+        size = os.path.getsize(path_or_url)
+        if MAX_IMAGE_BYTES > 0 and size > MAX_IMAGE_BYTES:
+            raise RuntimeError(f"image too large: {size} bytes (limit {MAX_IMAGE_BYTES})")
         with open(path_or_url, "rb") as f:
-            data = f.read()
-
-    # Convert WebP images to PNG (or JPEG) in memory before base64 encoding
-    if mime == "image/webp":
-        try:
-            img = Image.open(io.BytesIO(data))
-            with io.BytesIO() as out:
-                img.save(out, format="PNG")
-                data = out.getvalue()
-                mime = "image/png"
-        except Exception as e:
-            # Log but continue with original data if conversion fails
-            stash.Warn(f"Failed to convert WebP to PNG: {e}")
+            yield _prepare_image(f, mime, size)
 
-    return data, mime
+def _b64_stream(fp: BinaryIO, out: BinaryIO, hasher: Optional[Any] = None) -> None:
+    """
+    Base64-encode a stream into out chunk by chunk so the raw image is never held whole.
+    If given, hasher is fed the raw bytes along the way.
+    """
+    pending = b""
+    while True:
+        chunk = fp.read(B64_CHUNK)
+        if not chunk:
+            break
+        if hasher is not None:
+            hasher.update(chunk)
+        if pending:
+            chunk = pending + chunk
+        cut = len(chunk) - len(chunk) % 3
+        out.write(base64.b64encode(chunk[:cut]))
+        pending = chunk[cut:]
+    if pending:
+        out.write(base64.b64encode(pending))
 
 def _message_content_to_str(msg: Any) -> str:
     if isinstance(msg, str):
         return msg
-    if isinstance(msg, list):
-        parts: list[str] = []
-        for part in msg:
+    if isinstance(msg, list) and msg:
+        if len(msg) == 1:
+            # Common case: a single content part, no list or join needed.
+            part = msg[0]
             if isinstance(part, str):
-                parts.append(part)
-                continue
+                return part
             if isinstance(part, dict):
                 txt = part.get("text") or part.get("content")
                 if txt:
-                    parts.append(str(txt))
-        if parts:
-            return "\n".join(parts)
+                    return str(txt)
+        else:
+            # Local bindings keep the comprehension on LOAD_FAST instead of global lookups.
+            _isinstance, _str, _dict = isinstance, str, dict
+            parts = [
+                part if _isinstance(part, _str) else _str(txt)
+                for part in msg
+                if _isinstance(part, _str) or (_isinstance(part, _dict) and (txt := part.get("text") or part.get("content")))
+            ]
+            if parts:
+                return "\n".join(parts)
     if msg is None:
         return ""
     try:
@@ -260,15 +606,49 @@ def _message_content_to_str(msg: Any) -> str:
     except Exception:
         return str(msg)
 
-def _call_llm_b64_image(b64: str, mime: str, existing_tags: Optional[list[str]] = None) -> str:
-    url = f"{BASE_URL}/chat/completions"
-    headers = {"Authorization": f"Bearer {API_KEY}"} if API_KEY else {}
-    messages: list[dict[str, Any]] = [{"role": "system", "content": PROMPT}]
-    if existing_tags:
-        intro = "The following input is a JSON array of available tags. Choose from this list only if they clearly apply to THIS image. Do not guess or infer."
-        messages.append({"role": "user", "content": [{"type": "text", "text": intro}]})
-        messages.append({"role": "user", "content": [{"type": "text", "text": json.dumps(existing_tags, ensure_ascii=False)}]})
-    messages.append({"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64}"}}]})
+# Stands in for the base64 image data while the rest of the request body is serialized.
+_B64_PLACEHOLDER = "__LLM_IMAGE_TAG_B64__"
+
+TAG_LIST_INTRO = "The following input is a JSON array of available tags. Choose from this list only if they clearly apply to THIS image. Do not guess or infer."
+
+_tags_json_memo: tuple[Optional[list[str]], str] = (None, "")
+
+def _tags_json(existing_tags: list[str]) -> str:
+    """
+    JSON array of existing tags for the prompt, built once per cached tag list. Over
+    MAX_TAG_LIST_CHARS (0 for no limit) the tail is dropped; the list is ordered most-used
+    first, so the tags least likely to apply are the ones left out.
+    """
+    global _tags_json_memo
+    src, text = _tags_json_memo
+    if src is existing_tags:
+        return text
+    text = json.dumps(existing_tags, ensure_ascii=False)
+    if 0 < MAX_TAG_LIST_CHARS < len(text):
+        kept: list[str] = []
+        used = 2
+        for name in existing_tags:
+            cost = len(json.dumps(name, ensure_ascii=False)) + 2
+            if used + cost > MAX_TAG_LIST_CHARS:
+                break
+            kept.append(name)
+            used += cost
+        stash.Trace(f"[LLMImageTag] Tag list exceeds {MAX_TAG_LIST_CHARS} chars; sending {len(kept)} of {len(existing_tags)} tags")
+        text = json.dumps(kept, ensure_ascii=False)
+    _tags_json_memo = (existing_tags, text)
+    return text
+
+def _build_llm_body(fp: BinaryIO, mime: str, tags_json: str = "", hasher: Optional[Any] = None) -> memoryview:
+    """
+    Serialize the chat/completions request with the image streamed straight into the
+    encoded body, so no separate base64 string or dumped JSON copy is ever built.
+    The prompt and tag list come first and never vary per image, so servers with
+    prefix caching can reuse them.
+    """
+    messages: list[dict[str, Any]] = [{"role": "system", "content": _prompt()}]
+    if tags_json:
+        messages.append({"role": "user", "content": [{"type": "text", "text": f"{TAG_LIST_INTRO}\n{tags_json}"}]})
+    messages.append({"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:{mime};base64,{_B64_PLACEHOLDER}"}}]})
 
     # Log text-only parts
     try:
@@ -286,8 +666,23 @@ def _call_llm_b64_image(b64: str, mime: str, existing_tags: Optional[list[str]]
     except Exception:
         pass
 
-    payload = {"model": MODEL, "messages": messages, "temperature": TEMP, "max_tokens": MAX_TOKENS}
-    data = _http_post_json(url, payload, headers=headers, timeout=TIMEOUT)
+    payload: dict[str, Any] = {"model": _model(), "messages": messages, "temperature": _temp(), "max_tokens": _max_tokens()}
+    if CACHE_PROMPT:
+        # llama.cpp-style hint to keep the shared prompt prefix in the KV cache
+        payload["cache_prompt"] = True
+    # The image is the last string in the payload, so split on the last placeholder.
+    prefix, _, suffix = _dumps(payload).rpartition(_B64_PLACEHOLDER.encode("ascii"))
+    buf = io.BytesIO()
+    buf.write(prefix)
+    _b64_stream(fp, buf, hasher)
+    buf.write(suffix)
+    return buf.getbuffer()
+
+def _call_llm_b64_image(body: memoryview) -> str:
+    url = f"{_base_url()}/chat/completions"
+    api_key = _api_key()
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    data = _http_post_json(url, body, headers=headers)
     try:
         msg = (data["choices"][0]["message"]) or {}
         content = _message_content_to_str(msg.get("content"))
@@ -298,16 +693,16 @@ def _call_llm_b64_image(b64: str, mime: str, existing_tags: Optional[list[str]]
         raise RuntimeError(f"Unexpected LLM response: {data!r}")
 
 def _strip_think_blocks(text: str) -> str:
-    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL | re.IGNORECASE)
+    return _THINK_RE.sub("", text)
 
 def _parse_tags(text: str) -> List[str]:
     text = text.strip()
     tags: List[str] = []
-    start = text.find("["); end = text.rfind("]")
-    if start != -1 and end != -1 and end > start:
-        maybe_json = text[start : end + 1]
+    match = _JSON_ARR_RE.search(text)
+    if match:
+        maybe_json = match.group(0)
         try:
-            arr = json.loads(maybe_json)
+            arr = _loads(maybe_json)
             if isinstance(arr, list):
                 tags = [str(x) for x in arr]
         except Exception:
@@ -316,53 +711,72 @@ def _parse_tags(text: str) -> List[str]:
         sep = "," if "," in text else "\n"
         tags = [t.strip() for t in text.split(sep)]
 
+    # Local bindings keep the loop on LOAD_FAST instead of global/attribute lookups.
+    _strip, _lower, _len = str.strip, str.lower, len
+    _sub = _TAG_DISALLOWED_RE.sub
     cleaned: List[str] = []
+    _append = cleaned.append
     for t in tags:
-        t = t.strip().strip("#").strip().lower()
-        t = "".join(ch for ch in t if (ch.isalnum() or ch in "- _"))
-        if 1 <= len(t) <= 50:
-            cleaned.append(t)
-    seen = set()
-    uniq: List[str] = []
-    for t in cleaned:
-        if t and t not in seen:
-            seen.add(t)
-            uniq.append(t)
-    return uniq
+        t = _sub("", _lower(_strip(_strip(_strip(t), "#"))))
+        if 1 <= _len(t) <= 50:
+            _append(t)
+    return list(dict.fromkeys(cleaned))
 
-def _existing_tags() -> list[str]:
+def _fetch_existing_tags() -> Optional[list[str]]:
     try:
         query = """
             query($filter: FindFilterType) {
               findTags(filter: $filter) {
-                tags { name aliases ignore_auto_tag }
+                tags { name aliases ignore_auto_tag image_count }
               }
             }
         """
         variables = {"filter": {"per_page": -1}}
         resp = stash._graphql(query, variables)  # type: ignore[attr-defined]
-        names: list[str] = []
-        if isinstance(resp, dict):
-            tags = (((resp.get("data") or {}).get("findTags") or {}).get("tags")) or []
-            for t in tags or []:
-                if t.get("ignore_auto_tag"):
-                    continue
-                name = t.get("name")
-                if name:
-                    names.append(str(name))
-                for alias in t.get("aliases") or []:
-                    names.append(str(alias))
-        # de-dupe
-        seen = set()
-        uniq: list[str] = []
-        for n in names:
-            if n not in seen:
-                seen.add(n)
-                uniq.append(n)
-        return uniq
+        if not isinstance(resp, dict):
+            return None
+        return _tag_names(((resp.get("data") or {}).get("findTags") or {}).get("tags"))
     except Exception as e:
         stash.Trace(f"[LLMImageTag] Failed to fetch existing tags: {e}")
-        return []
+        return None
+
+def _tag_rank(tag: Dict[str, Any]) -> tuple[bool, int, str]:
+    # Most images first; tags without a count go last, alphabetically.
+    count = tag.get("image_count")
+    if not isinstance(count, int):
+        return (True, 0, str(tag.get("name") or "").lower())
+    return (False, -count, str(tag.get("name") or "").lower())
+
+def _tag_names(tags: Any) -> list[str]:
+    # Names and aliases of taggable tags ranked by _tag_rank, interned so every prompt
+    # in a batch shares the same string objects; dict.fromkeys de-dupes keeping the
+    # best-ranked occurrence.
+    _intern, _str = sys.intern, str
+    return list(dict.fromkeys(
+        _intern(_str(x))
+        for t in sorted((t for t in (tags or []) if not t.get("ignore_auto_tag")), key=_tag_rank)
+        for x in (t.get("name"), *(t.get("aliases") or []))
+        if x
+    ))
+
+_existing_tags_lock = threading.Lock()
+_existing_tags_cache: Optional[tuple[float, list[str]]] = None
+
+def _existing_tags() -> list[str]:
+    """
+    Existing tag names and aliases, cached for EXISTING_TAGS_TTL seconds so a batch
+    does not refetch the full tag list for every image. Failed fetches are not cached.
+    """
+    global _existing_tags_cache
+    with _existing_tags_lock:
+        cached = _existing_tags_cache
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        names = _fetch_existing_tags()
+        if names is None:
+            return []
+        _existing_tags_cache = (time.monotonic() + EXISTING_TAGS_TTL, names)
+        return names
 
 def _fetch_image_path(image_id: int) -> Optional[str]:
     try:
@@ -375,44 +789,210 @@ def _fetch_image_path(image_id: int) -> Optional[str]:
             }
         """
         resp = stash._graphql(query, {"id": str(image_id)})  # type: ignore[attr-defined]
-        img = (resp or {}).get("data", {}).get("findImage") or {}
-        path = None
-        paths = img.get("paths") or {}
-        if isinstance(paths, dict):
-            path = paths.get("image")
-        if not path:
-            files = img.get("files") or []
-            if isinstance(files, list) and files:
-                path = (files[0] or {}).get("path")
-        return path
+        return _image_path((resp or {}).get("data", {}).get("findImage") or {})
     except Exception as e:
         stash.Error(f"[LLMImageTag] GraphQL path lookup failed for image {image_id}: {e}")
         return None
 
-def tags_from_image(path_or_url: str) -> List[str]:
+def _image_path(img: Dict[str, Any]) -> Optional[str]:
+    path = None
+    paths = img.get("paths") or {}
+    if isinstance(paths, dict):
+        path = paths.get("image")
+    if not path:
+        files = img.get("files") or []
+        if isinstance(files, list) and files:
+            path = (files[0] or {}).get("path")
+    return path
+
+def _fetch_image_and_tags(image_id: int) -> Optional[tuple[Optional[str], list[str]]]:
+    """Image path and existing tag names in a single GraphQL round trip; None on failure."""
     try:
-        existing = _existing_tags()
-    except Exception:
-        existing = []
+        query = """
+            query($id: ID!, $filter: FindFilterType) {
+              findImage(id: $id) {
+                paths { image }
+                files { path }
+              }
+              findTags(filter: $filter) {
+                tags { name aliases ignore_auto_tag image_count }
+              }
+            }
+        """
+        resp = stash._graphql(query, {"id": str(image_id), "filter": {"per_page": -1}})  # type: ignore[attr-defined]
+        data = (resp or {}).get("data") if isinstance(resp, dict) else None
+        if not isinstance(data, dict) or not isinstance(data.get("findTags"), dict):
+            return None
+        return _image_path(data.get("findImage") or {}), _tag_names(data["findTags"].get("tags"))
+    except Exception as e:
+        stash.Trace(f"[LLMImageTag] Combined image/tag lookup failed for image {image_id}: {e}")
+        return None
+
+def _image_path_and_tags(image_id: int) -> tuple[Optional[str], list[str]]:
+    """
+    Image path plus existing tags. While the tag cache is cold both come from one
+    combined query (which also fills the cache); otherwise only the path is fetched.
+    """
+    global _existing_tags_cache
+    with _existing_tags_lock:
+        cached = _existing_tags_cache
+        if cached is None or cached[0] <= time.monotonic():
+            combined = _fetch_image_and_tags(image_id)
+            if combined is not None:
+                path, names = combined
+                _existing_tags_cache = (time.monotonic() + EXISTING_TAGS_TTL, names)
+                return path, names
+    return _fetch_image_path(image_id), _existing_tags()
+
+@functools.lru_cache(maxsize=None)
+def _cache_dir() -> str:
+    """Tag cache directory; kept outside results/, which is served as a UI asset."""
+    cache_dir = os.path.join(_plugin_dir(), "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def _cache_path(key: str) -> str:
+    return os.path.join(_cache_dir(), f"{key}.json")
+
+_cache_swept = False
+_cache_sweep_lock = threading.Lock()
+
+def _sweep_cache() -> None:
+    """Delete expired and excess cache entries (and stale temp files), once per process."""
+    global _cache_swept
+    with _cache_sweep_lock:
+        if _cache_swept:
+            return
+        _cache_swept = True
+    try:
+        now = time.time()
+        live: list[tuple[float, str]] = []
+        with os.scandir(_cache_dir()) as it:
+            for entry in it:
+                try:
+                    mtime = entry.stat().st_mtime
+                    if now - mtime > CACHE_TTL or (entry.name.endswith(".tmp") and now - mtime > 3600):
+                        os.remove(entry.path)
+                    elif entry.name.endswith(".json"):
+                        live.append((mtime, entry.path))
+                except OSError:
+                    continue
+        if len(live) > CACHE_MAX_ENTRIES:
+            live.sort()
+            for _, path in live[: len(live) - CACHE_MAX_ENTRIES]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    except Exception as e:
+        stash.Trace(f"[LLMImageTag] Cache sweep failed: {e}")
+
+@functools.lru_cache(maxsize=4)
+def _context_digest(tags_json: str) -> bytes:
+    """Digest of everything besides the image that shapes the LLM answer."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(b"\0".join(s.encode("utf-8") for s in (_model(), _prompt(), repr(_temp()), str(_max_tokens()), tags_json)))
+    return h.digest()
+
+def _cache_key(hasher: Any, tags_json: str) -> str:
+    """Finish an image-content hash by mixing in the prompt context."""
+    hasher.update(_context_digest(tags_json))
+    return hasher.hexdigest()
+
+def _stat_key(path_or_url: str, tags_json: str) -> Optional[str]:
+    """
+    Cache key for an unchanged local file (device, inode, size, mtime) so a repeat
+    run can skip reading it; None for URLs or unreadable paths. Unlike the content
+    key it never sees the prepared bytes, so the settings that shape them go in too.
+    """
+    if path_or_url.startswith("http://") or path_or_url.startswith("https://"):
+        return None
+    try:
+        st = os.stat(path_or_url)
+    except OSError:
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, MAX_IMAGE_EDGE, JPEG_QUALITY, Image is not None)).encode("ascii"))
+    h.update(_context_digest(tags_json))
+    return f"stat-{h.hexdigest()}"
+
+def _read_cached_tags(key: str) -> Optional[List[str]]:
+    path = _cache_path(key)
+    try:
+        if not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > CACHE_TTL:
+            os.remove(path)
+            return None
+        with open(path, "rb") as handle:
+            tags = _loads(handle.read()).get("tags")
+        return [str(t) for t in tags] if isinstance(tags, list) else None
+    except Exception as e:
+        stash.Trace(f"[LLMImageTag] Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def _write_cached_tags(key: str, tags: List[str]) -> None:
+    path = _cache_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
     try:
-        data, mime = _read_image_bytes(path_or_url)
-        b64 = base64.b64encode(data).decode("utf-8")
-        content = _call_llm_b64_image(b64, mime, existing_tags=existing)
+        with open(tmp_path, "wb") as handle:
+            handle.write(_dumps({"tags": tags}))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        stash.Trace(f"[LLMImageTag] Failed to write cache entry {path}: {e}")
+    _sweep_cache()
+
+def tags_from_image(path_or_url: str, existing: Optional[list[str]] = None) -> List[str]:
+    if existing is None:
+        try:
+            existing = _existing_tags()
+        except Exception:
+            existing = []
+    try:
+        use_cache = CACHE_TTL > 0 and _temp() <= CACHE_MAX_TEMP
+        hasher = hashlib.blake2b(digest_size=16) if use_cache else None
+        tags_json = _tags_json(existing) if existing else ""
+        stat_key = _stat_key(path_or_url, tags_json) if use_cache else None
+        if stat_key is not None:
+            cached = _read_cached_tags(stat_key)
+            if cached is not None:
+                stash.Trace(f"[LLMImageTag] Using cached tags for unchanged file {path_or_url}: {cached}")
+                return cached
+        with _open_image(path_or_url) as (fp, mime):
+            body = _build_llm_body(fp, mime, tags_json=tags_json, hasher=hasher)
+        cache_key = None
+        if hasher is not None:
+            cache_key = _cache_key(hasher, tags_json)
+            cached = _read_cached_tags(cache_key)
+            if cached is not None:
+                stash.Trace(f"[LLMImageTag] Using cached tags for {path_or_url}: {cached}")
+                if stat_key is not None:
+                    _write_cached_tags(stat_key, cached)
+                return cached
+        content = _call_llm_b64_image(body)
+        del body
         stash.Trace(f"[LLMImageTag] LLM raw output: {content}")
         cleaned = _strip_think_blocks(content)
         tags = _parse_tags(cleaned)
+        if cache_key and tags:
+            _write_cached_tags(cache_key, tags)
+            if stat_key is not None:
+                _write_cached_tags(stat_key, tags)
         return tags
+    except RateLimitError:
+        # Let batch callers back off and retry instead of recording an empty result.
+        raise
     except Exception as e:
         tb = traceback.format_exc()
         stash.Error(f"[LLMImageTag] Tagging failed for {path_or_url}: {e}\n{tb}")
         return []
 
 def tag_image(image_id: int) -> Optional[List[str]]:
-    path = _fetch_image_path(image_id)
+    path, existing = _image_path_and_tags(image_id)
     if not path:
         stash.Error(f"[LLMImageTag] No image path found for id={image_id}")
         return None
-    tags = tags_from_image(path)
+    tags = tags_from_image(path, existing)
     if not tags:
         stash.Warn(f"[LLMImageTag] No tags returned for image {image_id}")
     else:
@@ -445,6 +1025,120 @@ def tag_image_task() -> None:
         except Exception:
             pass
 
+class _AdaptiveLimiter:
+    """
+    Caps in-flight images. The cap is halved after RATE_LIMIT_STREAK consecutive
+    429s and grows back by one per success, up to the configured maximum.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.max_limit = self.limit = max(1, limit)
+        self.active = 0
+        self.streak = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self) -> "_AdaptiveLimiter":
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def record(self, rate_limited: bool) -> None:
+        with self.cond:
+            if not rate_limited:
+                self.streak = 0
+                if self.limit < self.max_limit:
+                    self.limit += 1
+                    self.cond.notify_all()
+                return
+            self.streak += 1
+            if self.streak >= RATE_LIMIT_STREAK and self.limit > 1:
+                self.limit = max(1, self.limit // 2)
+                self.streak = 0
+                stash.Warn(f"[LLMImageTag] Repeated rate limiting; lowering concurrency to {self.limit}")
+
+def _tag_image_with_backoff(image_id: int, limiter: _AdaptiveLimiter) -> Optional[List[str]]:
+    attempt = 0
+    while True:
+        try:
+            with limiter:
+                tags = tag_image(image_id)
+            limiter.record(False)
+            return tags
+        except RateLimitError as e:
+            limiter.record(True)
+            if attempt >= RATE_LIMIT_RETRIES:
+                raise
+            delay = RATE_LIMIT_BACKOFF * 2 ** attempt + random.random() * 0.2
+            attempt += 1
+            stash.Warn(f"[LLMImageTag] Rate limited on image {image_id} ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def tag_images_task() -> None:
+    args = (stash.JSON_INPUT or {}).get("args", {}) or {}
+    request_id = args.get("request_id")
+    raw_ids = args.get("image_ids")
+    if isinstance(raw_ids, str):
+        raw_ids = raw_ids.split(",")
+    elif raw_ids is None:
+        raw_ids = []
+    elif not isinstance(raw_ids, (list, tuple)):
+        raw_ids = [raw_ids]
+    parsed: list[int] = []
+    for raw in raw_ids:
+        if isinstance(raw, str) and not raw.strip():
+            continue
+        try:
+            parsed.append(int(raw))
+        except (TypeError, ValueError):
+            # No result file can be keyed on an id that is not a number, so just log it.
+            stash.Error(f"[LLMImageTag] Skipping invalid image id {raw!r}")
+    image_ids = list(dict.fromkeys(parsed))
+    if not image_ids:
+        stash.Error("[LLMImageTag] No image_ids supplied to tag_images_task")
+        return
+
+    def record(image_id: int, tags: List[str], error: Optional[str]) -> None:
+        try:
+            _write_result(image_id, tags, error=error, request_id=request_id)
+        except Exception as e:
+            stash.Error(f"[LLMImageTag] Failed to write result for image {image_id}: {e}")
+
+    try:
+        max_parallel = max(1, int(args.get("max_parallel") or MAX_PARALLEL))
+        # lru_cache does not stop concurrent first calls from each computing the value, so
+        # resolve the LLM settings (and the base URL's GraphQL probe) once before fanning out.
+        _base_url(), _model(), _temp(), _max_tokens(), _timeout(), _api_key(), _prompt()
+    except Exception as e:
+        stash.Error(f"[LLMImageTag] Exception in tag_images_task: {e}\nTraceBack={traceback.format_exc()}")
+        for image_id in image_ids:
+            record(image_id, [], str(e))
+        return
+    limiter = _AdaptiveLimiter(max_parallel)
+    stash.Log(f"[LLMImageTag] Tagging {len(image_ids)} images with up to {max_parallel} in parallel")
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        futures = {pool.submit(_tag_image_with_backoff, image_id, limiter): image_id for image_id in image_ids}
+        for future in as_completed(futures):
+            image_id = futures[future]
+            error = None
+            try:
+                tags = future.result()
+                if tags is None:
+                    error = "No image path found."
+                    tags = []
+            except Exception as e:
+                stash.Error(f"[LLMImageTag] Tagging failed for image {image_id}: {e}")
+                error = str(e)
+                tags = []
+            record(image_id, tags, error)
+
 def _plugin_dir() -> str:
     sc = stash.JSON_INPUT.get("server_connection") or stash.JSON_INPUT.get("serverConnection") or {}
     if isinstance(sc, dict):
@@ -454,12 +1148,18 @@ def _plugin_dir() -> str:
                 return val
     return os.path.dirname(os.path.abspath(__file__))
 
-def _write_result(image_id: int, tags: List[str], error: Optional[str] = None, request_id: Optional[str] = None) -> None:
+@functools.lru_cache(maxsize=None)
+def _results_dir() -> str:
+    """Results directory, created on first use rather than checked on every write."""
     results_dir = os.path.join(_plugin_dir(), "results")
     os.makedirs(results_dir, exist_ok=True)
+    return results_dir
+
+def _write_result(image_id: int, tags: List[str], error: Optional[str] = None, request_id: Optional[str] = None) -> None:
+    results_dir = _results_dir()
     safe_request_id = None
     if isinstance(request_id, str) and request_id.strip():
-        safe_request_id = re.sub(r"[^A-Za-z0-9_-]", "_", request_id.strip())
+        safe_request_id = _REQID_RE.sub("_", request_id.strip())
     payload = {
         "image_id": image_id,
         "tags": tags,
@@ -469,8 +1169,16 @@ def _write_result(image_id: int, tags: List[str], error: Optional[str] = None, r
     suffix = f"_{safe_request_id}" if safe_request_id else ""
     tmp_path = os.path.join(results_dir, f"{image_id}{suffix}.json.tmp")
     final_path = os.path.join(results_dir, f"{image_id}{suffix}.json")
-    with open(tmp_path, "w", encoding="utf-8") as handle:
-        json.dump(payload, handle)
+    # _dumps already yields encoded bytes, so skip the text layer and write them directly.
+    raw = _dumps(payload)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # os.write may write only part of the buffer; keep going so a truncated file is never published.
+        view = memoryview(raw)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
     os.replace(tmp_path, final_path)
 
 # -------------
@@ -478,13 +1186,19 @@ def _write_result(image_id: int, tags: List[str], error: Optional[str] = None, r
 # -------------
 try:
     if stash.Setting("zzdebugTracing", False):
-        stash.Log(f"[LLMImageTag] Using BASE_URL={BASE_URL!r} model={MODEL!r} temp={TEMP} max_tokens={MAX_TOKENS} timeout={TIMEOUT}")
+        stash.Log(f"[LLMImageTag] Using BASE_URL={_base_url()!r} model={_model()!r} temp={_temp()} max_tokens={_max_tokens()} timeout={_timeout()}")
     if stash.PLUGIN_TASK_NAME == "tag_image_task":
         stash.Trace(f"PLUGIN_TASK_NAME={stash.PLUGIN_TASK_NAME}")
         tag_image_task()
     elif stash.JSON_INPUT and (stash.JSON_INPUT.get("args", {}).get("mode") == "tag_image_task"):
         stash.Trace("Dispatch via args.mode=tag_image_task")
         tag_image_task()
+    elif stash.PLUGIN_TASK_NAME == "tag_images_task":
+        stash.Trace(f"PLUGIN_TASK_NAME={stash.PLUGIN_TASK_NAME}")
+        tag_images_task()
+    elif stash.JSON_INPUT and (stash.JSON_INPUT.get("args", {}).get("mode") == "tag_images_task"):
+        stash.Trace("Dispatch via args.mode=tag_images_task")
+        tag_images_task()
     else:
         stash.Trace(f"[LLMImageTag] No task specified (PLUGIN_TASK_NAME={stash.PLUGIN_TASK_NAME}). Nothing to do.")
 except Exception as e:
@@ -9,10 +9,14 @@ This implements:
 - Minimal GraphQL client for simple queries/mutations.
 """
 
+from __future__ import annotations
+
+import http.client
 import json
 import os
 import sys
-import urllib.error
+import threading
+import urllib.parse
 import urllib.request
 from typing import Any, Dict, Optional
 
@@ -33,6 +37,8 @@ class StashPluginHelper:
         self.config = config or {}
         self.maxbytes = maxbytes
         self.JSON_INPUT: Dict[str, Any] = _read_stdin_json(maxbytes)
+        # One keep-alive GraphQL connection per thread
+        self._local = threading.local()
 
         # Try to detect a task name similarly to the real helper
         args = self.JSON_INPUT.get("args", {}) if isinstance(self.JSON_INPUT.get("args"), dict) else {}
@@ -123,6 +129,27 @@ class StashPluginHelper:
             url = "http://127.0.01:9999/graphql"
         return url
 
+    def _graphql_connection(self, url: str) -> tuple[http.client.HTTPConnection, str]:
+        conn = getattr(self._local, "conn", None)
+        target = getattr(self._local, "target", None)
+        if conn is None or getattr(self._local, "url", None) != url:
+            parts = urllib.parse.urlsplit(url)
+            cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            # Honor *_proxy / no_proxy like urlopen did (proxy credentials are not supported).
+            proxy = urllib.request.getproxies().get(parts.scheme)
+            if proxy and not urllib.request.proxy_bypass(parts.hostname or ""):
+                pparts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+                conn = cls(pparts.hostname or "", pparts.port or 80, timeout=60)
+                if parts.scheme == "https":
+                    conn.set_tunnel(parts.hostname or "", parts.port)
+                else:
+                    target = urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path or "/", parts.query, ""))
+            else:
+                conn = cls(parts.hostname or "", parts.port, timeout=60)
+            self._local.conn, self._local.target, self._local.url = conn, target, url
+        return conn, target
+
     def _graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         url = self._graphql_url()
         headers = {"Content-Type": "application/json"}
@@ -134,21 +161,36 @@ class StashPluginHelper:
         payload = {"query": query, "variables": variables or {}}
         data = json.dumps(payload).encode("utf-8")
 
-        req = urllib.request.Request(url, data=data, headers=headers, method="POST")
         try:
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                body = resp.read()
-                if not body:
-                    self.Warn("Empty GraphQL response")
-                    return None
-                j = json.loads(body.decode("utf-8", errors="ignore"))
-                if isinstance(j, dict) and j.get("errors"):
-                    self.Error("GraphQL errors:", j.get("errors"))
-                    return None
-                return j
-        except urllib.error.HTTPError as e:
-            self.Error("HTTP error calling GraphQL:", e, "body=", getattr(e, "read", lambda: b"")().decode("utf-8", errors="ignore"))
-        except urllib.error.URLError as e:
+            for attempt in (0, 1):
+                conn, target = self._graphql_connection(url)
+                reused = conn.sock is not None
+                try:
+                    conn.request("POST", target, body=data, headers=headers)
+                    resp = conn.getresponse()
+                    body = resp.read()
+                    break
+                except ConnectionError:
+                    conn.close()
+                    # Stale keep-alive socket; reconnect once.
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except Exception:
+                    conn.close()
+                    raise
+            if resp.status >= 400:
+                self.Error("HTTP error calling GraphQL:", f"HTTP {resp.status} {resp.reason}", "body=", body.decode("utf-8", errors="ignore"))
+                return None
+            if not body:
+                self.Warn("Empty GraphQL response")
+                return None
+            j = json.loads(body.decode("utf-8", errors="ignore"))
+            if isinstance(j, dict) and j.get("errors"):
+                self.Error("GraphQL errors:", j.get("errors"))
+                return None
+            return j
+        except OSError as e:
             self.Error("URL error calling GraphQL:", e)
         except Exception as e:
             self.Error("Unexpected error calling GraphQL:", e)